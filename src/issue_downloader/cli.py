@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import logging
 import pathlib
@@ -6,7 +7,7 @@ from typing import Annotated, Optional
 
 import typer
 
-from issue_downloader.github_utils import get_issues, save_issues
+from issue_downloader.github_utils import save_issues, yield_issue_batches
 from issue_downloader.models import FileFormats
 from issue_downloader.settings import load_resume, save_resume
 
@@ -38,7 +39,7 @@ def download_github(
         Optional[str],
         typer.Option(
             help=(
-                "Download issues for this organisation." "Mutually exclusive to --repo."
+                "Download issues for this organisation.Mutually exclusive to --repo."
             ),
         ),
     ] = None,
@@ -116,12 +117,39 @@ def download_github(
 
     logger.info("Downloading issues")
 
-    issues = get_issues(
-        token=token, url=url, org=org, repos=repo, date=date, include_archived=archived
-    )
-    logger.info(f"{len(issues)} downloaded. Saving to files in {save_dir}")
-    save_issues(issues, root_path=save_dir, formats=formats)
-    logger.info("Issues saved!")
+    async def _download_and_save() -> int:
+        # Save each batch in a worker thread while the next page is being
+        # fetched, so disk writes overlap with the network latency and at most
+        # two batches are in memory: the one being written and the next one.
+        count = 0
+        save_task: Optional[asyncio.Task[None]] = None
+
+        async for batch in yield_issue_batches(
+            token=token,
+            url=url,
+            org=org,
+            repos=repo,
+            date=date,
+            include_archived=archived,
+        ):
+            if save_task:
+                await save_task
+
+            logger.info(f"Saving {len(batch)} issues to files in {save_dir}")
+            save_task = asyncio.create_task(
+                asyncio.to_thread(
+                    save_issues, batch, root_path=save_dir, formats=formats
+                )
+            )
+            count += len(batch)
+
+        if save_task:
+            await save_task
+
+        return count
+
+    count = asyncio.run(_download_and_save())
+    logger.info(f"{count} issues saved!")
 
     # Save todays date as the day data was fetched
     save_resume(
@@ -1,127 +1,187 @@
 """GraphQL query for the Github api."""
 
+import string
+from typing import Optional
+
 from issue_downloader.models import GraphQLFilter
 
+# The query documents are assembled once at import time, so each request only
+# has to substitute the short filter strings instead of concatenating the full
+# query from scratch.
+#
+# The filters are injected as strings because they will differ from the first
+# query (first: 100) to subsequent queries when there will be a cursor
+# (after: CURSOR). If using variables, the query fails with an empty cursor.
+
+# Label and comment selections are shared between the search query and the
+# per-issue overflow query.
+_LABELS_BLOCK = string.Template(
+    " labels("
+    " ${labels}"
+    " ) {"
+    "  pageInfo {"
+    "    hasNextPage"
+    "    endCursor"
+    "  }"
+    "  edges {"
+    "    cursor"
+    "    node {"
+    "      id"
+    "      name"
+    "      description"
+    "    }"
+    "  }"
+    " }"
+)
+
+_COMMENTS_BLOCK = string.Template(
+    " comments("
+    " ${comments}"
+    " ) {"
+    "  pageInfo {"
+    "    hasNextPage"
+    "    endCursor"
+    "  }"
+    "  edges {"
+    "    cursor"
+    "    node {"
+    "      id"
+    "      body"
+    "      created_at: createdAt"
+    "      author {"
+    "        login"
+    "      }"
+    "      reactions(first: 10) {"
+    "        edges {"
+    "          node {"
+    "            ... on Reaction {"
+    "              content"
+    "              user {"
+    "                login"
+    "              }"
+    "            }"
+    "          }"
+    "        }"
+    "      }"
+    "    }"
+    "  }"
+    " }"
+)
+
+_SEARCH_QUERY = string.Template(
+    " {"
+    " search("
+    " ${search}"
+    " ) {"
+    "   issueCount"
+    "   pageInfo {"
+    "    hasNextPage"
+    "    endCursor"
+    "   }"
+    "   edges {"
+    "     cursor"
+    "     node {"
+    "       ... on Issue {"
+    "         id"
+    "         number"
+    "         title"
+    "         url"
+    "         author {"
+    "           login"
+    "         }"
+    "         repository {"
+    "           id"
+    "           name"
+    "           owner {"
+    "             login"
+    "           }"
+    "           name_with_owner: nameWithOwner"
+    "           archived_at: archivedAt"
+    "           is_archived: isArchived"
+    " }"
+    " state"
+    " state_reason: stateReason"
+    " closed_at: closedAt"
+    " created_at: createdAt"
+    " updated_at: updatedAt"
+    " body"
+    " reactions(first: 10) {"
+    "   edges {"
+    "     node {"
+    "       ... on Reaction {"
+    "         content"
+    "         user {"
+    "           login"
+    "         }"
+    "       }"
+    "     }"
+    "   }"
+    " }"
+    " assignees(first: 10) {"
+    "   edges {"
+    "     node {"
+    "       id"
+    "       login"
+    "     }"
+    "   }"
+    " }" + _LABELS_BLOCK.template + _COMMENTS_BLOCK.template + " }"
+    " }"
+    " }"
+    " }"
+    " }"
+)
+
+_OVERFLOW_NODE = string.Template(
+    ' ${alias}: node(id:"${issue_id}") { ... on Issue { id ${fields} } }'
+)
+
 
 def get_query(
     search_filter: GraphQLFilter,
     labels_filter: GraphQLFilter,
     comments_filter: GraphQLFilter,
 ) -> str:
-    """Return a GraphQL query to get issues through search.
+    """Return a GraphQL query to get issues through search."""
+    return _SEARCH_QUERY.substitute(
+        search=str(search_filter),
+        labels=str(labels_filter),
+        comments=str(comments_filter),
+    )
+
+
+def get_overflow_query(
+    overflow: dict[str, tuple[Optional[str], Optional[str]]],
+) -> str:
+    """Return a GraphQL query fetching remaining label/comment pages in bulk.
 
+    "overflow" maps issue node ids to a (labels_after, comments_after) cursor
+    pair, where a None cursor means that connection has no more pages and is
+    left out of the selection. Every issue is aliased into the same query
+    ("i0", "i1", ...), so all follow-up pages are fetched in a single request
+    instead of one request per issue.
 
-    The filters are injected with f-strings because they will differ from
-    first query (first: 100) to subsequent queries when there will be a cursor
-    (after: CURSOR). If using variables, the query fails with an empty cursor.
+    Only requesting a single node per alias keeps well below Github's max node
+    count, so the page size can be increased to 100.
     """
-    return (
-        " {"
-        " search("
-        f" {search_filter}"
-        " ) {"
-        "   issueCount"
-        "   pageInfo {"
-        "    hasNextPage"
-        "    endCursor"
-        "   }"
-        "   edges {"
-        "     cursor"
-        "     node {"
-        "       ... on Issue {"
-        "         id"
-        "         number"
-        "         title"
-        "         url"
-        "         author {"
-        "           login"
-        "         }"
-        "         repository {"
-        "           id"
-        "           name"
-        "           owner {"
-        "             login"
-        "           }"
-        "           name_with_owner: nameWithOwner"
-        "           archived_at: archivedAt"
-        "           is_archived: isArchived"
-        " }"
-        " state"
-        " state_reason: stateReason"
-        " closed_at: closedAt"
-        " created_at: createdAt"
-        " updated_at: updatedAt"
-        " body"
-        " reactions(first: 10) {"
-        "   edges {"
-        "     node {"
-        "       ... on Reaction {"
-        "         content"
-        "         user {"
-        "           login"
-        "         }"
-        "       }"
-        "     }"
-        "   }"
-        " }"
-        " assignees(first: 10) {"
-        "   edges {"
-        "     node {"
-        "       id"
-        "       login"
-        "     }"
-        "   }"
-        " }"
-        " labels("
-        f" {labels_filter}"
-        " ) {"
-        "  pageInfo {"
-        "    hasNextPage"
-        "    endCursor"
-        "  }"
-        "  edges {"
-        "    cursor"
-        "    node {"
-        "      id"
-        "      name"
-        "      description"
-        "    }"
-        "  }"
-        " }"
-        " comments("
-        f" {comments_filter}"
-        " ) {"
-        "  pageInfo {"
-        "    hasNextPage"
-        "    endCursor"
-        "  }"
-        "  edges {"
-        "    cursor"
-        "    node {"
-        "      id"
-        "      body"
-        "      created_at: createdAt"
-        "      author {"
-        "        login"
-        "      }"
-        "      reactions(first: 10) {"
-        "        edges {"
-        "          node {"
-        "            ... on Reaction {"
-        "              content"
-        "              user {"
-        "                login"
-        "              }"
-        "            }"
-        "          }"
-        "        }"
-        "      }"
-        "    }"
-        "  }"
-        " }"
-        " }"
-        " }"
-        " }"
-        " }"
-        " }"
-    )
+    selections = []
+
+    for index, (issue_id, (labels_after, comments_after)) in enumerate(
+        overflow.items()
+    ):
+        fields = []
+
+        if labels_after:
+            labels_filter = GraphQLFilter(first=100, after=labels_after)
+            fields.append(_LABELS_BLOCK.substitute(labels=str(labels_filter)))
+
+        if comments_after:
+            comments_filter = GraphQLFilter(first=100, after=comments_after)
+            fields.append(_COMMENTS_BLOCK.substitute(comments=str(comments_filter)))
+
+        selections.append(
+            _OVERFLOW_NODE.substitute(
+                alias=f"i{index}", issue_id=issue_id, fields="".join(fields)
+            )
+        )
+
+    return " {" + "".join(selections) + " }"
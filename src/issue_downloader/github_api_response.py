@@ -0,0 +1,146 @@
+"""Typed models of the Github GraphQL api responses.
+
+The structs mirror the selections in github_api_query and are decoded straight
+from the response bytes with msgspec, which tokenizes the JSON and constructs
+the typed objects in a single pass without building dict intermediates.
+
+Field names follow the aliases in the queries (snake_case); the few keys
+Github returns in camelCase use rename="camel".
+"""
+
+import datetime
+from typing import Any, Generic, Optional, TypeVar
+
+import msgspec
+
+T = TypeVar("T")
+
+
+class Envelope(msgspec.Struct, Generic[T]):
+    """Outermost GraphQL response wrapper."""
+
+    data: Optional[T] = None
+    errors: Optional[list[Any]] = None
+
+
+class PageInfo(msgspec.Struct, rename="camel"):
+    has_next_page: bool
+    end_cursor: Optional[str] = None
+
+
+class Actor(msgspec.Struct):
+    login: str
+
+
+class ReactionNode(msgspec.Struct):
+    content: str
+    user: Actor
+
+
+class ReactionEdge(msgspec.Struct):
+    node: ReactionNode
+
+
+class ReactionConnection(msgspec.Struct):
+    edges: list[ReactionEdge]
+
+
+class AssigneeNode(msgspec.Struct):
+    id: str
+    login: str
+
+
+class AssigneeEdge(msgspec.Struct):
+    node: AssigneeNode
+
+
+class AssigneeConnection(msgspec.Struct):
+    edges: list[AssigneeEdge]
+
+
+class LabelNode(msgspec.Struct):
+    id: str
+    name: str
+    description: Optional[str] = None
+
+
+class LabelEdge(msgspec.Struct):
+    cursor: str
+    node: LabelNode
+
+
+class LabelConnection(msgspec.Struct, rename="camel"):
+    page_info: PageInfo
+    edges: list[LabelEdge]
+
+
+class CommentNode(msgspec.Struct):
+    id: str
+    body: str
+    created_at: datetime.datetime
+    reactions: ReactionConnection
+    author: Optional[Actor] = None
+
+
+class CommentEdge(msgspec.Struct):
+    cursor: str
+    node: CommentNode
+
+
+class CommentConnection(msgspec.Struct, rename="camel"):
+    page_info: PageInfo
+    edges: list[CommentEdge]
+
+
+class RepositoryNode(msgspec.Struct):
+    id: str
+    name: str
+    owner: Actor
+    name_with_owner: str
+    is_archived: bool
+    archived_at: Optional[datetime.datetime] = None
+
+
+class IssueNode(msgspec.Struct):
+    id: str
+    number: int
+    title: str
+    url: str
+    repository: RepositoryNode
+    state: str
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    body: str
+    reactions: ReactionConnection
+    assignees: AssigneeConnection
+    labels: LabelConnection
+    comments: CommentConnection
+    author: Optional[Actor] = None
+    state_reason: Optional[str] = None
+    closed_at: Optional[datetime.datetime] = None
+
+
+class IssueEdge(msgspec.Struct):
+    cursor: str
+    node: IssueNode
+
+
+class SearchConnection(msgspec.Struct, rename="camel"):
+    issue_count: int
+    page_info: PageInfo
+    edges: list[IssueEdge]
+
+
+class SearchData(msgspec.Struct):
+    search: SearchConnection
+
+
+class OverflowNode(msgspec.Struct):
+    """An aliased node(id:...) selection from the overflow query.
+
+    Only the connections that were requested for the issue are present.
+    """
+
+    id: str
+    labels: Optional[LabelConnection] = None
+    comments: Optional[CommentConnection] = None
@@ -1,63 +1,94 @@
 """Collection of utils to fetch issues from the Github api."""
 
-import copy
+import concurrent.futures
+import dataclasses
 import datetime
-import json
+import functools
+import importlib.metadata
 import logging
+import os
 import pathlib
-from typing import Any, Optional
+from typing import AsyncIterator, Optional, TypeVar
 
 import httpx
-import pydantic
+import msgspec
+import orjson
 
-from issue_downloader.github_api_query import get_query
+from issue_downloader import github_api_response as api
+from issue_downloader.github_api_query import get_overflow_query, get_query
 from issue_downloader.models import (
+    REACTION_MAPPING,
     Comment,
     FileFormats,
     GraphQLFilter,
     Issue,
     IssueType,
     Label,
+    Reaction,
     Repository,
     SearchQuery,
-    parse_reactions,
 )
+from issue_downloader.settings import load_issue_index, save_issue_index
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-def get_client(token: str, base_url: str) -> httpx.Client:
+# Decoders are built once at import time; decoding constructs the typed
+# response structs in a single pass over the bytes, without building dict
+# intermediates.
+_SEARCH_DECODER = msgspec.json.Decoder(api.Envelope[api.SearchData])
+_OVERFLOW_DECODER = msgspec.json.Decoder(api.Envelope[dict[str, api.OverflowNode]])
+
+
+def get_client(token: str, base_url: str) -> httpx.AsyncClient:
     """Create a client ready for the Github API.
 
     Using a client makes the requests slightly faster and its a convenient way
-    to set headers.
+    to set headers. The requests are issued one at a time (each page depends on
+    the cursor from the previous one), so a single keep-alive HTTP/2 connection
+    is reused across them, avoiding a new TCP+TLS handshake per request. gzip
+    shrinks the highly repetitive GraphQL JSON responses considerably.
     """
-    c = httpx.Client(base_url=base_url)
+    c = httpx.AsyncClient(
+        base_url=base_url,
+        http2=True,
+        # Only one request is ever in flight, so a single connection suffices.
+        # The expiry just needs to outlive the gap between paginated requests.
+        limits=httpx.Limits(
+            max_connections=1, max_keepalive_connections=1, keepalive_expiry=30
+        ),
+    )
     c.headers.update(
         {
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
+            "Accept-Encoding": "gzip",
+            "User-Agent": (
+                f"issue-downloader/{importlib.metadata.version('issue-downloader')}"
+            ),
         }
     )
 
     return c
 
 
-def make_request(client: httpx.Client, query: str) -> dict[str, Any]:
-    """Make a request, return data, handle errors."""
+async def make_request(
+    client: httpx.AsyncClient,
+    query: str,
+    decoder: "msgspec.json.Decoder[api.Envelope[T]]",
+) -> T:
+    """Make a request, return the typed response data, handle errors."""
 
-    r = client.post("graphql", json={"query": query})
+    r = await client.post("graphql", json={"query": query})
 
     r.raise_for_status()
 
-    if "errors" in r.json():
-        logger.debug(f"Error, response was {r.text}")
-        raise RuntimeError(f"Error from Github api: {r.json()['errors']}")
-
+    # Decode the body straight into the typed response structs, which both
+    # parses and validates the JSON in a single pass.
     try:
-        data: dict[str, Any] = r.json()["data"]["search"]
-        return data
-    except json.JSONDecodeError as e:
+        envelope = decoder.decode(r.content)
+    except msgspec.DecodeError as e:
         logging.debug(
             f"Error decoding api response: {r.status_code}: {r.text}", exc_info=True
         )
@@ -65,8 +96,85 @@ def make_request(client: httpx.Client, query: str) -> dict[str, Any]:
             "Something went wrong. Could not decode response from Github API"
         ) from e
 
+    if envelope.errors:
+        logger.debug(f"Error, response was {r.text}")
+        raise RuntimeError(f"Error from Github api: {envelope.errors}")
+
+    if envelope.data is None:
+        raise RuntimeError("Empty response from Github api")
+
+    return envelope.data
+
+
+def _parse_reactions(reactions: api.ReactionConnection) -> list[Reaction]:
+    """Build Reactions from the api response, mapping the content to emojis."""
+    return [
+        Reaction(
+            content=REACTION_MAPPING[edge.node.content],
+            user=edge.node.user.login,
+        )
+        for edge in reactions.edges
+    ]
+
+
+def _parse_labels(edges: list[api.LabelEdge]) -> list[Label]:
+    return [
+        Label.model_construct(name=edge.node.name, description=edge.node.description)
+        for edge in edges
+    ]
+
+
+def _parse_comments(edges: list[api.CommentEdge]) -> list[Comment]:
+    # The fields are already type-checked by the response decoding, so the
+    # models are built with model_construct and the validator transformations
+    # (author unpacking, line-ending normalization) applied directly.
+    return [
+        Comment.model_construct(
+            id=edge.node.id,
+            body=edge.node.body.replace("\r\n", "\n"),
+            author=edge.node.author.login if edge.node.author else "",
+            created_at=edge.node.created_at,
+            reactions=_parse_reactions(edge.node.reactions),
+        )
+        for edge in edges
+    ]
+
+
+def _parse_issue(
+    node: api.IssueNode, labels: list[Label], comments: list[Comment]
+) -> Issue:
+    """Build an Issue from the api response node.
+
+    Same as for _parse_comments, the response decoding has already checked the
+    types so the model is built without re-validation.
+    """
+    return Issue.model_construct(
+        author=node.author.login if node.author else "",
+        body=node.body.replace("\r\n", "\n"),
+        created_at=node.created_at,
+        id=node.id,
+        number=node.number,
+        repository=Repository.model_construct(
+            id=node.repository.id,
+            name=node.repository.name,
+            owner=node.repository.owner.login,
+            is_archived=node.repository.is_archived,
+            archived_at=node.repository.archived_at,
+        ),
+        state=node.state,
+        title=node.title,
+        updated_at=node.updated_at,
+        url=node.url,
+        assignees=[edge.node.login for edge in node.assignees.edges],
+        closed_at=node.closed_at,
+        comments=comments,
+        labels=labels,
+        reactions=_parse_reactions(node.reactions),
+        state_reason=node.state_reason,
+    )
+
 
-def get_issues(
+async def yield_issue_batches(
     token: str,
     url: str,
     *,
@@ -76,8 +184,12 @@ def get_issues(
     repos: Optional[list[str]] = None,
     include_archived: bool = False,
     include_closed: bool = True,
-) -> list[Issue]:
-    """Get issues from the Github API
+) -> AsyncIterator[list[Issue]]:
+    """Get issues from the Github API, yielded one search page at a time.
+
+    Yielding batches as they arrive means the caller can start writing issues
+    to disk while the next page is being fetched, and only one page of issues
+    has to be held in memory at a time.
 
     If "repo" and "org" is set, result will include issues for both repo _and_
     org.
@@ -90,11 +202,6 @@ def get_issues(
     will only get the next page of labels _on that issues_. All other objects
     will still be returned from the start issue.
 
-    This creates a deduplication issue. To get around this, the cursor from the
-    previous item is extracted and only fetch one item after that. This means
-    if comments get paginated we will only extract 1 issue and then page the
-    comments as many times as needed.
-
     About max nodes:
 
     To protect from expensive queries where e.g., millions of objects are
@@ -126,207 +233,244 @@ def get_issues(
         include_closed=include_closed,
         include_archived=include_archived,
     )
-    search_filter = GraphQLFilter(first=100, type=issue_type, query=query)
-    labels_filter = GraphQLFilter(first=10)
-    comments_filter = GraphQLFilter(first=10)
-
-    issues, search_issue_count = _get_paginated_issues(
-        client,
-        search_filter=search_filter,
-        labels_filter=labels_filter,
-        comments_filter=comments_filter,
-    )
+    # Request 100 labels/comments per issue up front, which covers almost all
+    # issues without a follow-up request. The search page is kept at 25 issues
+    # so the total selection (25·100·10 sub-nodes) stays well below Github's
+    # max node count.
+    search_filter = GraphQLFilter(first=25, type=issue_type, query=query)
+    labels_filter = GraphQLFilter(first=100)
+    comments_filter = GraphQLFilter(first=100)
+
+    # The overlapping date searches can return issues that have already been
+    # yielded, so track the Github ids and drop duplicates before yielding.
+    seen_ids: set[str] = set()
+    fetched = 0
 
-    # Search returns max 1000 results. If there are more than 1000 issues, make
-    # a new search for issues created after the latest issue fetched. The
-    # search is ordered in ascending creation order.
+    try:
+        while True:
+            search_issue_count = 0
+            last_issue: Optional[Issue] = None
 
-    while search_issue_count > 1000 and len(issues) % 1000 == 0:
-        logger.debug(f"Found {search_issue_count} issues. Have fetched {len(issues)}")
+            async for page_issues, search_issue_count in _get_paginated_issues(
+                client,
+                search_filter=search_filter,
+                labels_filter=labels_filter,
+                comments_filter=comments_filter,
+            ):
+                fetched += len(page_issues)
+                if page_issues:
+                    last_issue = page_issues[-1]
 
-        latest_date = issues[-1].created_at.date()
+                batch = [i for i in page_issues if i.id not in seen_ids]
+                seen_ids.update(i.id for i in batch)
 
-        logger.debug(
-            (
-                f"Will search for more issues after {latest_date} "
-                f"(latest issue {issues[-1].title})"
-            )
-        )
+                if batch:
+                    yield batch
 
-        new_search_filter = copy.copy(search_filter)
-        new_search_filter.after = None
-        new_search_filter.query.updated = latest_date  # type: ignore[union-attr]
+            # Search returns max 1000 results. If there are more than 1000
+            # issues, make a new search for issues created after the latest
+            # issue fetched. The search is ordered in ascending creation
+            # order.
 
-        next_issue_batch, search_issue_count = _get_paginated_issues(
-            client, new_search_filter, labels_filter, comments_filter
-        )
-        logger.debug(
-            (
-                f"Next batch has {len(next_issue_batch)},"
-                f" total search count {search_issue_count}"
-            )
-        )
+            if not (search_issue_count > 1000 and fetched % 1000 == 0 and last_issue):
+                break
 
-        issues.extend(next_issue_batch)
+            logger.debug(f"Found {search_issue_count} issues. Have fetched {fetched}")
 
-    # Deduplicate the list before returning it
-    return list(set(issues))
+            latest_date = last_issue.created_at.date()
 
+            logger.debug(
+                (
+                    f"Will search for more issues after {latest_date} "
+                    f"(latest issue {last_issue.title})"
+                )
+            )
 
-def _get_paginated_labels(
-    client: httpx.Client,
-    search_filter: GraphQLFilter,
-    labels_filter: GraphQLFilter,
-    comments_filter: GraphQLFilter,
-    issue_data: dict[str, Any],
-) -> list[Label]:
-    labels = []
+            search_filter = dataclasses.replace(search_filter, after=None)
+            search_filter.query.updated = latest_date  # type: ignore[union-attr]
+    finally:
+        await client.aclose()
 
-    labels.extend(
-        pydantic.TypeAdapter(list[Label]).validate_python(
-            [edge["node"] for edge in issue_data["labels"]["edges"]],
-        )
-    )
 
-    if issue_data["labels"]["pageInfo"]["hasNextPage"]:
-        labels_filter_next = copy.copy(labels_filter)
+async def get_issues(
+    token: str,
+    url: str,
+    *,
+    date: Optional[datetime.date] = None,
+    issue_type: IssueType = IssueType.ISSUE,
+    org: Optional[str] = None,
+    repos: Optional[list[str]] = None,
+    include_archived: bool = False,
+    include_closed: bool = True,
+) -> list[Issue]:
+    """Get all issues from the Github API as one list.
+
+    Convenience wrapper around yield_issue_batches for callers that do not
+    need the streaming behaviour; see that function for details about
+    pagination and search limits.
+    """
+    issues: list[Issue] = []
+
+    async for batch in yield_issue_batches(
+        token,
+        url,
+        date=date,
+        issue_type=issue_type,
+        org=org,
+        repos=repos,
+        include_archived=include_archived,
+        include_closed=include_closed,
+    ):
+        issues.extend(batch)
 
-        labels_filter_next.first = 100
-        labels_filter_next.after = issue_data["labels"]["pageInfo"]["endCursor"]
+    return issues
 
-        inner_query = get_query(search_filter, labels_filter_next, comments_filter)
-        inner_response = make_request(client, inner_query)
 
-        # Only one issue in this response due search_filter, so can use indexing below
-        inner_issue_data = inner_response["edges"][0]["node"]
+async def _fetch_overflow_batched(
+    client: httpx.AsyncClient,
+    overflow: dict[str, tuple[Optional[str], Optional[str]]],
+) -> dict[str, tuple[list[Label], list[Comment]]]:
+    """Fetch the remaining label/comment pages for all overflowing issues.
 
-        labels.extend(
-            _get_paginated_labels(
-                client,
-                search_filter,
-                labels_filter_next,
-                comments_filter,
-                inner_issue_data,
-            )
-        )
+    "overflow" maps issue node ids to a (labels_after, comments_after) cursor
+    pair, with None meaning that connection has no more pages. All issues are
+    aliased into one query (see get_overflow_query), so each round of the loop
+    costs a single request regardless of how many issues overflowed. Another
+    round is only needed if a connection has more than 100 additional items.
+    """
 
-    return labels
+    results: dict[str, tuple[list[Label], list[Comment]]] = {
+        issue_id: ([], []) for issue_id in overflow
+    }
 
+    while overflow:
+        query = get_overflow_query(overflow)
+        response = await make_request(client, query, _OVERFLOW_DECODER)
 
-def _get_paginated_comments(
-    client: httpx.Client,
-    search_filter: GraphQLFilter,
-    labels_filter: GraphQLFilter,
-    comments_filter: GraphQLFilter,
-    issue_data: dict[str, Any],
-) -> list[Comment]:
-    comments = []
+        next_overflow: dict[str, tuple[Optional[str], Optional[str]]] = {}
 
-    comments.extend(
-        pydantic.TypeAdapter(list[Comment]).validate_python(
-            [edge["node"] for edge in issue_data["comments"]["edges"]],
-        )
-    )
+        for node in response.values():
+            labels, comments = results[node.id]
 
-    if issue_data["comments"]["pageInfo"]["hasNextPage"]:
-        comments_filter_next = copy.copy(comments_filter)
+            labels_after: Optional[str] = None
+            comments_after: Optional[str] = None
 
-        # When only one is requested, the subnodes can be increased
-        comments_filter_next.first = 100
-        comments_filter_next.after = issue_data["comments"]["pageInfo"]["endCursor"]
+            if node.labels:
+                labels.extend(_parse_labels(node.labels.edges))
+                if node.labels.page_info.has_next_page:
+                    labels_after = node.labels.page_info.end_cursor
 
-        inner_query = get_query(search_filter, labels_filter, comments_filter_next)
-        inner_response = make_request(client, inner_query)
+            if node.comments:
+                comments.extend(_parse_comments(node.comments.edges))
+                if node.comments.page_info.has_next_page:
+                    comments_after = node.comments.page_info.end_cursor
 
-        # Only one issue in this response due search_filter, so can use indexing below
-        inner_issue_data = inner_response["edges"][0]["node"]
+            if labels_after or comments_after:
+                next_overflow[node.id] = (labels_after, comments_after)
 
-        comments.extend(
-            _get_paginated_comments(
-                client,
-                search_filter,
-                labels_filter,
-                comments_filter_next,
-                inner_issue_data,
-            )
-        )
+        overflow = next_overflow
 
-    return comments
+    return results
 
 
-def _get_paginated_issues(
-    client: httpx.Client,
+async def _get_paginated_issues(
+    client: httpx.AsyncClient,
     search_filter: GraphQLFilter,
     labels_filter: GraphQLFilter,
     comments_filter: GraphQLFilter,
-) -> tuple[list[Issue], int]:
-    """Helper function that gets issues, resolve pagination and return a full result.
+) -> AsyncIterator[tuple[list[Issue], int]]:
+    """Helper generator that gets issues and yields one resolved page at a time.
 
-    Search results returns max 1000 issues, so this function also returns the
-    total issue count so the parent function can initiating more searches.
+    Search results returns max 1000 issues, so each page is yielded together
+    with the total issue count so the parent function can initiating more
+    searches.
     """
 
-    issues = []
-
-    query = get_query(search_filter, labels_filter, comments_filter)
-    search_result = make_request(client, query)
-
-    for index, issue_edge in enumerate(search_result["edges"]):
-        # Prepare the search_filter for labels and comments by getting the
-        # previous cursor and requesting only one item. This is used if there
-        # is pagination in the labels response.
-        search_filter_single_issue = copy.copy(search_filter)
-        search_filter_single_issue.first = 1
-        search_filter_single_issue.after = search_result["edges"][index - 1]["cursor"]
-
-        # Get all labels (recursively)
-        labels = _get_paginated_labels(
-            client,
-            search_filter_single_issue,
-            labels_filter,
-            comments_filter,
-            issue_edge["node"],
-        )
+    # Loop over the search pages instead of recursing, which keeps the stack
+    # flat no matter how many pages the search returns.
+    while True:
+        query = get_query(search_filter, labels_filter, comments_filter)
+        search_result = (await make_request(client, query, _SEARCH_DECODER)).search
 
-        # Get all comments (recursively)
-        comments = _get_paginated_comments(
-            client,
-            search_filter_single_issue,
-            labels_filter,
-            comments_filter,
-            issue_edge["node"],
-        )
+        # Collect the issues whose labels or comments have more pages and
+        # fetch all the remaining pages in one aliased follow-up query. Most
+        # issues have no extra pages at all.
+        overflow: dict[str, tuple[Optional[str], Optional[str]]] = {}
 
-        data = {
-            **issue_edge["node"],
-            "repository": Repository(**issue_edge["node"]["repository"]),
-            "assignees": [
-                a["node"]["login"] for a in issue_edge["node"]["assignees"]["edges"]
-            ],
-            "comments": comments,
-            "labels": labels,
-            "reactions": parse_reactions(issue_edge["node"]["reactions"]),
-        }
+        for issue_edge in search_result.edges:
+            node = issue_edge.node
 
-        issue = Issue(**data)
-        issues.append(issue)
+            labels_after = (
+                node.labels.page_info.end_cursor
+                if node.labels.page_info.has_next_page
+                else None
+            )
+            comments_after = (
+                node.comments.page_info.end_cursor
+                if node.comments.page_info.has_next_page
+                else None
+            )
+
+            if labels_after or comments_after:
+                overflow[node.id] = (labels_after, comments_after)
+
+        overflow_results = await _fetch_overflow_batched(client, overflow)
+
+        page_issues = []
+
+        for issue_edge in search_result.edges:
+            node = issue_edge.node
+
+            labels = _parse_labels(node.labels.edges)
+            comments = _parse_comments(node.comments.edges)
+
+            extra_labels, extra_comments = overflow_results.get(node.id, ([], []))
+            labels.extend(extra_labels)
+            comments.extend(extra_comments)
+
+            page_issues.append(_parse_issue(node, labels, comments))
+
+        yield page_issues, search_result.issue_count
+
+        if not search_result.page_info.has_next_page:
+            break
 
-    if search_result["pageInfo"]["hasNextPage"]:
         logger.debug(
             (
                 "Fetching next page of issues"
-                f" (after {search_result['pageInfo']['endCursor']})"
+                f" (after {search_result.page_info.end_cursor})"
             )
         )
-        search_filter.after = search_result["pageInfo"]["endCursor"]
+        search_filter.after = search_result.page_info.end_cursor
 
-        inner_issues, _ = _get_paginated_issues(
-            client, search_filter, labels_filter, comments_filter
-        )
 
-        issues.extend(inner_issues)
+def _write_issue(
+    issue: Issue,
+    formats: list[FileFormats],
+    root_path: pathlib.Path,
+) -> None:
+    """Write one issue to disk in the requested formats.
+
+    The repository directory is expected to already exist (see save_issues).
+    """
+    path_dir = root_path / issue.repository.owner / issue.repository.name
+
+    # TODO: Create a nice filename from the issue title. Perhaps there is
+    # a "url-friendly" name in the api?
+
+    # Save markdown. Streaming the chunks through a buffered writer avoids
+    # materializing the full document in memory first.
+    if FileFormats.MD in formats:
+        path_file = path_dir / f"{issue.number}.md"
+        with path_file.open("wb", buffering=1 << 16) as fh:
+            for chunk in issue.iter_markdown_chunks():
+                fh.write(chunk.encode("utf-8"))
+                fh.write(b"\n")
 
-    return issues, search_result["issueCount"]
+    # Save JSON
+    if FileFormats.JSON in formats:
+        path_file = path_dir / f"{issue.number}.json"
+        path_file.write_bytes(orjson.dumps(issue.model_dump(mode="json")))
 
 
 def save_issues(
@@ -334,19 +478,65 @@ def save_issues(
     formats: list[FileFormats],
     root_path: pathlib.Path = pathlib.Path("."),
 ) -> None:
-    for issue in issues:
-        path_dir = root_path / issue.repository.owner / issue.repository.name
+    # Skip issues that have not changed since they were last saved, tracked
+    # through an on-disk index of id to updated_at and the formats written. A
+    # resumed sync refetches everything updated since the stored date, but
+    # most of those files are already up to date on disk. An issue is only
+    # skipped if the index also covers every requested format, so a later run
+    # with more formats still writes the missing files.
+    index = load_issue_index(root_path)
+    requested = {file_format.value for file_format in formats}
+
+    def _is_current(issue: Issue) -> bool:
+        entry = index.get(issue.id)
+        # Entries written by earlier versions are plain updated_at strings
+        # without the formats; treat them as stale so the files are rewritten.
+        if not isinstance(entry, dict):
+            return False
+        return entry.get(
+            "updated_at"
+        ) == issue.updated_at.isoformat() and requested <= set(entry.get("formats", []))
+
+    issues = [issue for issue in issues if not _is_current(issue)]
+
+    if not issues:
+        return
+
+    # Create each repository directory once up front instead of issuing a
+    # mkdir syscall per issue.
+    for path_dir in {
+        root_path / issue.repository.owner / issue.repository.name for issue in issues
+    }:
         path_dir.mkdir(parents=True, exist_ok=True)
 
-        # TODO: Create a nice filename from the issue title. Perhaps there is
-        # a "url-friendly" name in the api?
+    # The issues are independent of each other, so the writes can be spread
+    # over a thread pool to overlap the file system latency.
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(32, (os.cpu_count() or 1) * 4)
+    ) as executor:
+        # Consume the iterator so any exception from a write is re-raised
+        list(
+            executor.map(
+                functools.partial(_write_issue, formats=formats, root_path=root_path),
+                issues,
+            )
+        )
 
-        # Save markdown
-        if FileFormats.MD in formats:
-            path_file = path_dir / f"{issue.number}.md"
-            path_file.write_text(issue.as_markdown())
+    for issue in issues:
+        entry = index.get(issue.id)
+        # Keep formats written by a previous run for the same updated_at, so
+        # alternating --format runs do not mark each other's files as missing.
+        if (
+            isinstance(entry, dict)
+            and entry.get("updated_at") == issue.updated_at.isoformat()
+        ):
+            saved = set(entry.get("formats", [])) | requested
+        else:
+            saved = requested
+
+        index[issue.id] = {
+            "updated_at": issue.updated_at.isoformat(),
+            "formats": sorted(saved),
+        }
 
-        # Save JSON
-        if FileFormats.JSON in formats:
-            path_file = path_dir / f"{issue.number}.json"
-            path_file.write_text(issue.model_dump_json())
+    save_issue_index(root_path, index)
@@ -1,7 +1,7 @@
 import dataclasses
 import datetime
 import enum
-from typing import Any, Literal, Optional
+from typing import Any, Iterator, Literal, Optional
 
 import pydantic
 
@@ -28,7 +28,25 @@ class SearchQuery:
     include_closed: bool = True
     include_archived: bool = False
 
+    # Cache of (field values, rendered string). The rendered string is reused
+    # on every request in the pagination loops, where the query rarely
+    # changes; comparing the field values invalidates the cache on mutation.
+    _cache: Optional[tuple[tuple[Any, ...], str]] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
     def __str__(self) -> str:
+        key: tuple[Any, ...] = (
+            self.issue_type,
+            self.updated,
+            tuple(self.repos) if self.repos else None,
+            self.user,
+            self.include_closed,
+            self.include_archived,
+        )
+        if self._cache and self._cache[0] == key:
+            return self._cache[1]
+
         search_string = []
 
         search_string.append(f"is:{self.issue_type.value}")
@@ -47,7 +65,9 @@ class SearchQuery:
         if not self.include_archived:
             search_string.append("archived:false")
 
-        return " ".join(search_string)
+        rendered = " ".join(search_string)
+        self._cache = (key, rendered)
+        return rendered
 
 
 @dataclasses.dataclass
@@ -63,18 +83,32 @@ class GraphQLFilter:
     type: Optional[IssueType] = None
     query: Optional[SearchQuery] = None
 
+    # See SearchQuery._cache. The nested query is keyed on its rendered
+    # string, which is itself cached.
+    _cache: Optional[tuple[tuple[Any, ...], str]] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
     def __str__(self) -> str:
         """String suitable for GraphQL query."""
+        query_string = str(self.query) if self.query else None
+
+        key = (self.first, self.after, self.type, query_string)
+        if self._cache and self._cache[0] == key:
+            return self._cache[1]
+
         out = [f"first:{self.first}"]
 
         if self.after:
             out.append(f'after:"{self.after}"')
         if self.type:
             out.append(f"type:{self.type.value}")
-        if self.query:
-            out.append(f'query:"{self.query}"')
+        if query_string is not None:
+            out.append(f'query:"{query_string}"')
 
-        return " ".join(out)
+        rendered = " ".join(out)
+        self._cache = (key, rendered)
+        return rendered
 
 
 class Repository(pydantic.BaseModel):
@@ -105,17 +139,17 @@ REACTION_MAPPING = {
 }
 
 
-class Reaction(pydantic.BaseModel):
-    content: str
-    user: str
+@dataclasses.dataclass(frozen=True, slots=True)
+class Reaction:
+    """A single reaction, with the content already mapped to an emoji.
 
-    @pydantic.field_validator("content", mode="before")
-    def emoji_content(cls, v: Any, _: pydantic.ValidationInfo) -> str:
-        return REACTION_MAPPING[v]
+    A plain dataclass since reactions are the most instantiated object in the
+    system and need none of the pydantic validation machinery; the emoji
+    mapping happens in parse_reactions.
+    """
 
-    def __hash__(self) -> int:
-        """Hashable function to identify unique reactions"""
-        return hash((self.content, self.user))
+    content: str
+    user: str
 
 
 class Label(pydantic.BaseModel):
@@ -153,14 +187,19 @@ class Comment(pydantic.BaseModel):
         return parse_reactions(v)
 
     @pydantic.field_validator("body", mode="before")
-    def convert_line_endings(cls, v: Any, _: pydantic.ValidationInfo) -> str:
-        s: str = v.encode("utf-8").replace(b"\r\n", b"\n").decode("utf-8")
-        return s
+    def convert_line_endings(cls, v: Any, _: pydantic.ValidationInfo) -> Any:
+        # str.replace runs in a single C-level pass, no need to round-trip
+        # through bytes.
+        return v.replace("\r\n", "\n") if isinstance(v, str) else v
 
     def __hash__(self) -> int:
         """Hashable function to identify unique objects through the Github id"""
         return hash(self.id)
 
+    def reactions_grouped(self) -> dict[str, list[str]]:
+        """Group reaction with reaction as key and reactee as value."""
+        return group_reactions(self.reactions)
+
 
 class Issue(pydantic.BaseModel):
     author: str
@@ -189,9 +228,10 @@ class Issue(pydantic.BaseModel):
             return ""
 
     @pydantic.field_validator("body", mode="before")
-    def convert_line_endings(cls, v: Any, _: pydantic.ValidationInfo) -> str:
-        s: str = v.encode("utf-8").replace(b"\r\n", b"\n").decode("utf-8")
-        return s
+    def convert_line_endings(cls, v: Any, _: pydantic.ValidationInfo) -> Any:
+        # str.replace runs in a single C-level pass, no need to round-trip
+        # through bytes.
+        return v.replace("\r\n", "\n") if isinstance(v, str) else v
 
     def __hash__(self) -> int:
         """Hashable function to identify unique objects through the Github id"""
@@ -199,82 +239,87 @@ class Issue(pydantic.BaseModel):
 
     def reactions_grouped(self) -> dict[str, list[str]]:
         """Group reaction with reaction as key and reactee as value."""
-        out: dict[str, list[str]] = {}
-        if self.reactions:
-            for r in self.reactions:
-                out.setdefault(r.content, []).append(r.user)
-        return out
+        return group_reactions(self.reactions)
 
-    def as_markdown(self) -> str:
-        """Return a Markdown string for the issue."""
-        out = []
+    def iter_markdown_chunks(self) -> Iterator[str]:
+        """Yield the Markdown representation line by line.
 
-        out.append(f"# {self.title}\n")
+        Yielding chunks lazily means the full document never has to be
+        materialized in memory when streaming it to a file.
+        """
+        yield f"# {self.title}\n"
 
-        out.append(
-            (
-                f"[{self.repository.owner}/{self.repository.name}#{self.number}]"
-                f"({self.url})\n"
-            )
+        yield (
+            f"[{self.repository.owner}/{self.repository.name}#{self.number}]"
+            f"({self.url})\n"
         )
 
         # Add a note about the repository
         if self.repository.is_archived:
-            out.append(f"Repository was archived at {self.repository.archived_at}\n")
+            yield f"Repository was archived at {self.repository.archived_at}\n"
 
         # Issue state
         if self.state == "CLOSED":
-            out.append(f"Issue was closed at {self.closed_at} ({self.state_reason})\n")
+            yield f"Issue was closed at {self.closed_at} ({self.state_reason})\n"
 
         # Updated_at will always have a value, but might be the same as the
         # creation time. Only add it if it is different.
         if self.updated_at == self.created_at:
-            out.append(f"{self.author} created at {self.created_at}\n")
+            yield f"{self.author} created at {self.created_at}\n"
         else:
-            out.append(
-                (
-                    f"{self.author} created at {self.created_at}."
-                    f" Updated at {self.updated_at}\n"
-                )
+            yield (
+                f"{self.author} created at {self.created_at}."
+                f" Updated at {self.updated_at}\n"
             )
 
         if self.assignees:
-            out.append(f"Assigned to {', '.join(self.assignees)}")
+            yield f"Assigned to {', '.join(self.assignees)}"
 
         # Add labels:
         if self.labels:
-            out.append("Labels:\n")
-            out.extend(f"- {label}" for label in self.labels)
+            yield "Labels:\n"
+            yield from (f"- {label}" for label in self.labels)
 
         # Add reactions
         if self.reactions:
-            out.append("Reactions:\n")
-            out.extend(
+            yield "Reactions:\n"
+            yield from (
                 f"{r} ({', '.join(u)})" for r, u in self.reactions_grouped().items()
             )
 
         # Add the body itself
-        out.append("\n\n---\n")
-        out.append(self.body)
-        out.append("\n---\n\n")
+        yield "\n\n---\n"
+        yield self.body
+        yield "\n---\n\n"
 
         # Add comments
         if self.comments:
-            out.append("## Comments")
+            yield "## Comments"
             for c in self.comments:
-                out.append(f"### {c.author} (on {c.created_at})\n")
+                yield f"### {c.author} (on {c.created_at})\n"
 
                 # TODO: Fix \r\n in output
-                out.append(c.body)
+                yield c.body
 
-                out.append("\n---\n")
+                yield "\n---\n"
                 if c.reactions:
-                    out.extend(
+                    yield from (
                         f"{r} ({', '.join(u)})"
-                        for r, u in self.reactions_grouped().items()
+                        for r, u in c.reactions_grouped().items()
                     )
 
-        return "\n".join(out)
+    def as_markdown(self) -> str:
+        """Return a Markdown string for the issue."""
+        return "\n".join(self.iter_markdown_chunks())
+
+
+def group_reactions(reactions: Optional[list[Reaction]]) -> dict[str, list[str]]:
+    """Group reactions with the reaction as key and the reactees as value."""
+    out: dict[str, list[str]] = {}
+    if reactions:
+        for r in reactions:
+            out.setdefault(r.content, []).append(r.user)
+    return out
 
 
 def parse_reactions(data: dict[str, Any]) -> list[Reaction]:
@@ -284,6 +329,9 @@ def parse_reactions(data: dict[str, Any]) -> list[Reaction]:
     """
 
     return [
-        Reaction(user=r["node"]["user"]["login"], content=r["node"]["content"])
+        Reaction(
+            content=REACTION_MAPPING[r["node"]["content"]],
+            user=r["node"]["user"]["login"],
+        )
         for r in data["edges"]
     ]
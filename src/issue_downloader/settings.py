@@ -1,13 +1,23 @@
 import datetime
 import hashlib
-import json
 import pathlib
-from typing import Optional
+from typing import Any, Optional
+
+import orjson
 
 # File where the settings will be saved
 SETTINGS_FILE = pathlib.Path.home() / ".issue-downloader.json"
 
 
+def _load_settings() -> dict[str, Any]:
+    """Load the settings file, returning an empty dict if it does not exist."""
+    try:
+        settings: dict[str, Any] = orjson.loads(SETTINGS_FILE.read_bytes())
+        return settings
+    except FileNotFoundError:
+        return {}
+
+
 def get_settings_key(
     issue_save_path: pathlib.Path,
     url: str,
@@ -21,7 +31,9 @@ def get_settings_key(
     settings_key = (
         f"{issue_save_path}:{url}:{org}:{repos}:{include_archived}:{include_closed}"
     )
-    return hashlib.sha256(settings_key.encode("utf-8")).hexdigest()
+    # The key only needs to be unique, not cryptographically strong, so use
+    # blake2b which is faster than sha256 and gives a shorter digest.
+    return hashlib.blake2b(settings_key.encode("utf-8"), digest_size=16).hexdigest()
 
 
 def load_resume(
@@ -43,13 +55,7 @@ def load_resume(
     )
 
     try:
-        with open(SETTINGS_FILE) as fh:
-            settings = json.load(fh)
-    except FileNotFoundError:
-        return None
-
-    try:
-        return datetime.date.fromisoformat(settings[key]["date"])
+        return datetime.date.fromisoformat(_load_settings()[key]["date"])
     except (KeyError, ValueError):
         return None
 
@@ -70,15 +76,31 @@ def save_resume(
         issue_path, url, org, repos, include_archived, include_closed
     )
 
-    # Open previous settings
+    # Read-modify-write the previous settings
+    settings = _load_settings()
+    settings.setdefault(key, {})["date"] = str(date)
+
+    SETTINGS_FILE.write_bytes(orjson.dumps(settings, option=orjson.OPT_INDENT_2))
+
+
+def _index_file(issue_save_path: pathlib.Path) -> pathlib.Path:
+    """Path to the issue index for a save directory.
+
+    The index lives in the save directory itself so different save targets do
+    not shadow each other.
+    """
+    return issue_save_path / ".issue-downloader-index.json"
+
+
+def load_issue_index(issue_save_path: pathlib.Path) -> dict[str, Any]:
+    """Load the index mapping issue id to the updated_at and formats saved."""
     try:
-        with open(SETTINGS_FILE) as fh:
-            settings = json.load(fh)
+        index: dict[str, Any] = orjson.loads(_index_file(issue_save_path).read_bytes())
+        return index
     except FileNotFoundError:
-        settings = {}
+        return {}
 
-    # Save the key in the settings
-    settings.setdefault(key, {})["date"] = str(date)
 
-    with open(SETTINGS_FILE, "w") as fh:
-        json.dump(settings, fh, indent=2)
+def save_issue_index(issue_save_path: pathlib.Path, index: dict[str, Any]) -> None:
+    """Save the index mapping issue id to the updated_at and formats saved."""
+    _index_file(issue_save_path).write_bytes(orjson.dumps(index))